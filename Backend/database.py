@@ -4,6 +4,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import urllib.parse
+from metrics import TimedQueuePool, instrument_engine
 
 load_dotenv()
 
@@ -30,9 +31,12 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 # --- STEP 3: Create the Engine ---
 engine = create_engine(
     DATABASE_URL,
-    pool_size=10,
-    max_overflow=20
+    poolclass=TimedQueuePool, # Records pool checkout waits for /metrics
+    # Multi-worker mode divides these between workers (see gunicorn_conf.py)
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20"))
 )
+instrument_engine(engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
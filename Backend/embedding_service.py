@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_WAIT, stage_timer
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so that concurrent query embeddings share one
+    batched forward pass. Requests arriving within `max_wait_ms` of each other
+    are coalesced (up to `max_batch_size`), a query identical to one already
+    being embedded waits for that result, and recent query vectors are kept in
+    an LRU cache so repeated queries skip the model entirely. An optional
+    `shared_cache` (see shared_state.SharedVectorCache) is consulted behind the
+    LRU so vectors are reused across worker processes.
+    """
+
+    def __init__(self, base, max_batch_size=32, max_wait_ms=5, cache_size=1024, shared_cache=None):
+        self.base = base
+        self.shared_cache = shared_cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+
+        self._queue = []  # (text, future, enqueued_at)
+        self._pending = {}  # text -> future, for texts queued or being embedded
+        self._cond = threading.Condition()
+        self._worker = None
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "queries_embedded": 0,
+            "cache_hits": 0,
+            "shared_cache_hits": 0,
+            "in_flight_hits": 0,
+            "cache_misses": 0,      # Queries that had to go to the model
+            "embed_failures": 0,
+            "max_batch_size": 0,
+            "total_queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+        }
+
+    # --- Embeddings interface ---
+    def embed_documents(self, texts):
+        # Bulk ingestion (PDF uploads) is already batched, so go straight to the model
+        with stage_timer("embedding_bulk"):
+            return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = self._cache_get(text)
+        if vector is not None:
+            self._count("cache_hits")
+            return list(vector)
+
+        if self.shared_cache is not None:
+            vector = self.shared_cache.get(text)
+            if vector is not None:
+                self._count("shared_cache_hits")
+                self._cache_put(text, vector)
+                return list(vector)
+
+        with self._cond:
+            future = self._pending.get(text)
+            if future is None:
+                future = self._pending[text] = Future()
+                self._ensure_worker()
+                self._queue.append((text, future, time.monotonic()))
+                self._cond.notify()
+                counter = "cache_misses"
+            else:
+                # The same query is already queued or in the model: share its result
+                counter = "in_flight_hits"
+        self._count(counter)
+        return list(future.result())
+
+    # --- LRU CACHE ---
+    def _cache_get(self, text):
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+        return vector
+
+    def _cache_put(self, text, vector):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- BATCHING WORKER ---
+    def _ensure_worker(self):
+        # Called with self._cond held
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Hold the window open (measured from the oldest request) so others can join
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+
+            # Texts in the queue are unique (duplicates wait on the pending future)
+            texts = [text for text, _, _ in batch]
+            try:
+                with stage_timer("embedding"):
+                    vectors = self.base.embed_documents(texts)
+            except Exception as e:
+                self._finish(texts)
+                self._count("embed_failures")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            # Cache first, then stop tracking as pending, so a repeat never misses both
+            for text, vector in zip(texts, vectors):
+                self._cache_put(text, vector)
+                if self.shared_cache is not None:
+                    self.shared_cache.put(text, vector)
+            self._finish(texts)
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            self._record_batch(len(texts), [started - enqueued_at for _, _, enqueued_at in batch])
+
+    def _finish(self, texts):
+        with self._cond:
+            for text in texts:
+                self._pending.pop(text, None)
+
+    # --- STATS ---
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _record_batch(self, size, waits):
+        EMBEDDING_BATCH_SIZE.observe(size)
+        for wait in waits:
+            EMBEDDING_QUEUE_WAIT.observe(wait)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["queries_embedded"] += size
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], size)
+            self._stats["total_queue_wait_ms"] += sum(waits) * 1000
+            self._stats["max_queue_wait_ms"] = max(self._stats["max_queue_wait_ms"], max(waits) * 1000)
+
+    def raw_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._cond:
+            stats["queue_depth"] = len(self._queue)
+        with self._cache_lock:
+            stats["cache_entries"] = len(self._cache)
+        return stats
+
+    @staticmethod
+    def summarize_stats(raw):
+        """Derives averages from raw counters (which may be summed over several workers)."""
+        stats = dict(raw)
+        total_wait = stats.pop("total_queue_wait_ms")
+        stats["avg_batch_size"] = round(stats["queries_embedded"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["avg_queue_wait_ms"] = round(total_wait / stats["queries_embedded"], 3) if stats["queries_embedded"] else 0
+        stats["max_queue_wait_ms"] = round(stats["max_queue_wait_ms"], 3)
+        return stats
@@ -0,0 +1,146 @@
+import csv
+import datetime
+import io
+import re
+
+from sqlalchemy import DateTime, Float, Integer, select
+
+import models
+from database import SessionLocal
+
+# Rows fetched per round trip (server-side cursor) and written per CSV chunk / Parquet row group
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_TABLES = {
+    "student_marks": models.StudentMark,
+    "doubts": models.DoubtRecord,
+    "quiz_scores": models.QuizScore,
+}
+
+# Which CO columns belong to each unit (same mapping as deep-analytics)
+UNIT_MARK_COLUMNS = {
+    "1": ["co1"],
+    "2": ["co2"],
+    "3": ["co3_cat1", "co3_cat2"],
+    "4": ["co4"],
+    "5": ["co5"],
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def build_export_query(table, unit=None, start=None, end=None):
+    """Returns (column names, select statement) for an export, applying the unit and inclusive date filters."""
+    model = EXPORT_TABLES.get(table)
+    if model is None:
+        raise ExportError(f"Unknown table '{table}'. Choose one of: {', '.join(EXPORT_TABLES)}")
+
+    if model is models.StudentMark:
+        # Marks have no unit or timestamp column: a unit picks that unit's CO columns instead
+        if start or end:
+            raise ExportError("student_marks has no timestamp, so it cannot be filtered by date")
+        names = [c.name for c in model.__table__.columns]
+        if unit:
+            match = re.search(r"\d+", unit)
+            if not match or match.group() not in UNIT_MARK_COLUMNS:
+                raise ExportError(f"Could not map unit '{unit}' to a CO column (units {', '.join(UNIT_MARK_COLUMNS)})")
+            names = ["id", "register_no", "name"] + UNIT_MARK_COLUMNS[match.group()] + ["total_percentage"]
+        columns = [model.__table__.c[name] for name in names]
+        return names, select(*columns).order_by(model.id)
+
+    columns = list(model.__table__.columns)
+    query = select(*columns).order_by(model.id)
+    if model is models.DoubtRecord:
+        query = query.where(model.topic != "System") # Skip the unit placeholder rows
+    if unit:
+        query = query.where(model.unit == unit)
+    if start:
+        query = query.where(model.timestamp >= start)
+    if end:
+        query = query.where(model.timestamp < end + datetime.timedelta(days=1))
+    return [c.name for c in columns], query
+
+
+def _stream_batches(query):
+    # Own session: the response body is produced after the request handler has returned
+    db = SessionLocal()
+    try:
+        # yield_per streams through a server-side cursor instead of loading the whole table
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield rows
+    finally:
+        db.close()
+
+
+# --- CSV ---
+def stream_csv(names, query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield buffer.getvalue()
+
+    for rows in _stream_batches(query):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(
+            [v.isoformat() if isinstance(v, datetime.datetime) else v for v in row] for row in rows
+        )
+        yield buffer.getvalue()
+
+
+# --- PARQUET ---
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the response instead of storing them."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def stream_parquet(names, query):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = query.selected_columns
+    schema = pa.schema([pa.field(name, _arrow_type(pa, column)) for name, column in zip(names, columns)])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        # One row group per fetched batch, flushed to the client as soon as it is written
+        for rows in _stream_batches(query):
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
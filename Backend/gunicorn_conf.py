@@ -0,0 +1,94 @@
+import gc
+import glob
+import math
+import os
+import sys
+import tempfile
+
+# Multi-worker serving:
+#   gunicorn Backend.main:app -c Backend/gunicorn_conf.py
+#
+# The app (MiniLM model, pandas, LangChain) is imported once in the master and the
+# workers are forked from it, so those pages are shared copy-on-write instead of
+# being loaded once per process.
+#
+# Shared across workers: query vector cache, Groq budget and priority order
+# (shared_state.py), metrics and /admin stats (merged snapshots, metrics.py).
+# Still per worker: the embedding LRU and in-flight prompt coalescing, so the
+# same prompt arriving at two workers at once is sent to Groq twice.
+
+
+
+def available_cpus():
+    """CPUs this container may actually use: affinity mask, capped by a cgroup CPU quota."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f: # cgroup v2, e.g. "200000 100000"
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try: # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            return cpus
+    if quota not in ("max", "-1"):
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(1, cpus)
+
+
+CPUS = available_cpus()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+workers = int(os.getenv("WEB_CONCURRENCY", CPUS))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# PDF uploads still parse and embed on the request path
+timeout = 120
+
+# Split the database connection budget (pool_size=10, max_overflow=20 for a single
+# process) between the workers instead of giving each worker the full pool
+os.environ.setdefault("DB_POOL_SIZE", str(max(2, 10 // workers)))
+os.environ.setdefault("DB_MAX_OVERFLOW", str(max(2, 20 // workers)))
+
+# Tells main.py to put the query vector cache and Groq budget in shared memory
+os.environ.setdefault("EDUAI_SHARED_STATE", "1")
+# Workers publish metric/stats snapshots here; /metrics and /admin/*-stats merge them
+if "EDUAI_METRICS_DIR" not in os.environ:
+    os.environ["EDUAI_METRICS_DIR"] = tempfile.mkdtemp(prefix="eduai-metrics-")
+
+
+def on_starting(server):
+    # Counters from a previous run in a reused directory would otherwise be added in
+    for path in glob.glob(os.path.join(os.environ["EDUAI_METRICS_DIR"], "worker-*.json")):
+        os.remove(path)
+
+
+def when_ready(server):
+    # The app is loaded and no worker exists yet. Freezing moves every object into a
+    # permanent generation so GC passes in the workers don't write to (and un-share) them.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (create_all) must not be shared between workers
+    from database import engine
+    engine.dispose(close=False)
+
+    # Start from an empty registry (the master recorded its startup queries) and publish it
+    import metrics
+    metrics.reset_metrics()
+    metrics.start_snapshot_writer()
+
+    # Split the cores between workers instead of every worker's torch using all of them.
+    # Nothing is embedded in the master, so each worker builds its own thread pool.
+    torch = sys.modules.get("torch") # Only if the embedding model loaded it
+    if torch is not None:
+        torch.set_num_threads(max(1, CPUS // workers))
+
+
+def worker_exit(server, worker):
+    # Keep this worker's final counts in the totals after it is gone
+    import metrics
+    metrics.write_snapshot()
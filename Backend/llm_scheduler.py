@@ -0,0 +1,251 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import LLM_LATENCY, LLM_TOKENS
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0  # Live tutoring (/student/ask)
+QUIZ = 1         # Quiz generation
+ANALYTICS = 2    # Faculty deep-analytics insights
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", QUIZ: "quiz", ANALYTICS: "analytics"}
+
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+class TokenBucket:
+    """Requests-per-minute and tokens-per-minute budget, refilled continuously."""
+
+    # Single process: the scheduler's own heap already orders every waiter, so there
+    # is nothing to announce and no need to poll (see SharedTokenBucket)
+    poll_interval = None
+
+    def announce(self, priority, tokens):
+        pass
+
+    def withdraw(self, priority):
+        pass
+
+    def outranked(self, priority, tokens):
+        return False
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.requests_per_minute, self.requests + elapsed * self.requests_per_minute / 60)
+        self.tokens = min(self.tokens_per_minute, self.tokens + elapsed * self.tokens_per_minute / 60)
+
+    def reserve(self, tokens):
+        """Consume one request and `tokens` if available. Returns 0, or seconds to wait before retrying."""
+        # A single call larger than the whole budget would otherwise never fit
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.requests >= 1 and self.tokens >= tokens:
+                self.requests -= 1
+                self.tokens -= tokens
+                return 0
+            wait_requests = (1 - self.requests) * 60 / self.requests_per_minute
+            wait_tokens = (tokens - self.tokens) * 60 / self.tokens_per_minute
+            return max(wait_requests, wait_tokens, 0.01)
+
+    def adjust(self, tokens):
+        """Correct the token budget once the real usage of a call is known (may go negative)."""
+        with self._lock:
+            self.tokens -= tokens
+
+    def pause(self, seconds):
+        """Stop handing out budget for `seconds` (used after the provider returns a 429)."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(e):
+    if getattr(e, "status_code", None) == 429:
+        return True
+    return type(e).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(e):
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """
+    Central gate for all Groq calls. Calls wait for budget in a token bucket and
+    are released in priority order, identical in-flight prompts share a single
+    call, and 429 responses are retried with exponential backoff.
+
+    Waiting happens on the event loop, so queued calls hold no threads. Only the
+    blocking `llm.invoke` runs on the scheduler's own executor, which keeps it
+    out of the threadpool that sync endpoints and `run_in_threadpool` rely on.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, max_retries=4, base_delay=1.0,
+                 max_concurrency=16, bucket=None):
+        self.bucket = bucket or TokenBucket(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        # Threads are only started on first use, so this is safe to create before forking
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+
+        # Event-loop state (asyncio primitives bind to the loop on first use)
+        self._cond = asyncio.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._inflight = {}  # call key -> [task, number of callers waiting on it]
+
+        self._stats = {
+            "calls": 0,
+            "coalesced": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "failures": 0,
+            "total_queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+        }
+
+    async def invoke(self, llm, prompt, priority=INTERACTIVE):
+        # Same model, temperature and prompt -> the same in-flight call
+        key = (getattr(llm, "model_name", None), getattr(llm, "temperature", None), prompt)
+        entry = self._inflight.get(key)
+        if entry is None:
+            # The call runs in a task owned by the scheduler, not by its first caller
+            task = asyncio.ensure_future(self._invoke_with_retry(llm, prompt, priority))
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._stats["coalesced"] += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # Shielded so one caller going away doesn't cancel the call for the others
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Nobody is waiting any more: drop the call (new callers start a fresh one)
+                self._inflight.pop(key, None)
+                task.cancel()
+
+    def _finish(self, key, task):
+        if self._inflight.get(key, [None])[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # No "never retrieved" warnings
+
+    async def _invoke_with_retry(self, llm, prompt, priority):
+        completion_tokens = getattr(llm, "max_tokens", None) or DEFAULT_COMPLETION_TOKENS
+        estimate = len(prompt) // 4 + completion_tokens
+        seq = next(self._seq)  # Keep our place in line across retries
+
+        model = getattr(llm, "model_name", None) or "unknown"
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, seq, estimate)
+            self._stats["calls"] += 1
+            start = time.perf_counter()
+            try:
+                response = await loop.run_in_executor(self._executor, llm.invoke, prompt)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                outcome = "rate_limited" if rate_limited else "error"
+                LLM_LATENCY.observe(time.perf_counter() - start, model=model, priority=priority_name, outcome=outcome)
+                if not rate_limited:
+                    self._stats["failures"] += 1
+                    raise
+                self._stats["rate_limited"] += 1
+                if attempt == self.max_retries:
+                    self._stats["failures"] += 1
+                    raise
+                delay = retry_after_seconds(e) or self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.0)
+                # Every waiting call backs off, not just this one
+                self.bucket.pause(delay)
+                self._stats["retries"] += 1
+                continue
+
+            LLM_LATENCY.observe(time.perf_counter() - start, model=model, priority=priority_name, outcome="ok")
+            usage = getattr(response, "usage_metadata", None) or {}
+            LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+            LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+            if usage.get("total_tokens"):
+                self.bucket.adjust(usage["total_tokens"] - estimate)
+            return response
+
+    async def _acquire(self, priority, seq, tokens):
+        ticket = (priority, seq)
+        started = time.monotonic()
+        announced = False
+        async with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket:
+                        # Other processes sharing the bucket may have more urgent calls
+                        # waiting that the remaining budget can't also cover
+                        if self.bucket.outranked(priority, tokens):
+                            delay = self.bucket.poll_interval
+                        else:
+                            delay = self.bucket.reserve(tokens)
+                            if delay == 0:
+                                break
+                        # Only a call that is actually kept waiting holds back lower classes
+                        self.bucket.announce(priority, tokens)
+                        announced = True
+                        if self.bucket.poll_interval:
+                            delay = min(delay, self.bucket.poll_interval)
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await self._cond.wait()
+            finally:
+                if announced:
+                    self.bucket.withdraw(priority)
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+        waited_ms = (time.monotonic() - started) * 1000
+        self._stats["total_queue_wait_ms"] += waited_ms
+        self._stats["max_queue_wait_ms"] = max(self._stats["max_queue_wait_ms"], waited_ms)
+
+    def raw_stats(self):
+        stats = dict(self._stats)
+        stats["queue_depth"] = len(self._waiting)
+        stats["in_flight"] = len(self._inflight)
+        return stats
+
+    @staticmethod
+    def summarize_stats(raw):
+        """Derives averages from raw counters (which may be summed over several workers)."""
+        stats = dict(raw)
+        total_wait = stats.pop("total_queue_wait_ms")
+        stats["avg_queue_wait_ms"] = round(total_wait / stats["calls"], 3) if stats["calls"] else 0
+        stats["max_queue_wait_ms"] = round(stats["max_queue_wait_ms"], 3)
+        return stats
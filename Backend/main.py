@@ -3,8 +3,11 @@ import json
 import bcrypt
 import re
 import pandas as pd # Ensure pandas is imported
+from datetime import date
+from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Form, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from dotenv import load_dotenv
@@ -12,6 +15,11 @@ from dotenv import load_dotenv
 # Internal Imports
 import models
 from database import engine, get_db
+from embedding_service import BatchedEmbeddings
+from llm_scheduler import LLMScheduler, INTERACTIVE, QUIZ, ANALYTICS
+from shared_state import SharedTokenBucket, SharedVectorCache
+from metrics import MetricsMiddleware, collect_stats, register_stats, render_metrics, stage_timer, timed
+from exports import ExportError, build_export_query, stream_csv, stream_parquet
 
 # LangChain & AI Imports
 from langchain_community.document_loaders import PyPDFLoader
@@ -19,7 +27,7 @@ from langchain_groq import ChatGroq
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from models import UnitPDF # Import the new model
 
 
@@ -37,11 +45,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+# Per-route latency histograms, served at /metrics
+app.add_middleware(MetricsMiddleware)
 
 # AI Setup
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index_name = "eduai"
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+
+# Multi-worker mode (see gunicorn_conf.py): this module is imported once in the master
+# before forking, so the model is shared copy-on-write and the shared-memory state
+# below (query vector cache, Groq budget) is inherited by every worker.
+SHARED_STATE = os.getenv("EDUAI_SHARED_STATE") == "1"
+
+# Query embeddings from concurrent requests are coalesced into one batched forward pass
+embeddings = BatchedEmbeddings(
+    HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"),
+    shared_cache=SharedVectorCache() if SHARED_STATE else None
+)
+# Every Groq call goes through this (shared rate budget, priorities, 429 retries).
+# ChatGroq clients are built with max_retries=0 so retries only happen here.
+llm_scheduler = LLMScheduler(
+    requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+    bucket=SharedTokenBucket(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE) if SHARED_STATE else None
+)
+# Published with the metrics snapshots so the /admin stats cover every worker
+register_stats("embedding", embeddings.raw_stats)
+register_stats("llm", llm_scheduler.raw_stats)
 
 # --- PHET SIMULATION DATABASE ---
 PHET_DATABASE = [
@@ -91,22 +123,30 @@ def find_simulation(query: str):
     return None
 
 # --- SECURITY HELPERS ---
+@timed("bcrypt")
 def hash_password(password: str):
     salt = bcrypt.gensalt()
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+@timed("bcrypt")
 def verify_password(plain_password: str, hashed_password: str):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+# --- HELPER: RAG SEARCH ---
+@timed("vector_search")
+def search_unit(query, unit, k):
+    vector_db = PineconeVectorStore(index_name=index_name, embedding=embeddings)
+    return vector_db.similarity_search(query, k=k, filter={"unit": unit})
+
 # --- HELPER: CATEGORIZATION ---
-def categorize_doubt(question, context):
-    llm = ChatGroq(model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"))
+async def categorize_doubt(question, context):
+    llm = ChatGroq(model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
     prompt = f"Context: {context[:1000]}\nQuestion: {question}\nReturn ONLY a 1-2 word topic name."
     try:
-        res = llm.invoke(prompt)
+        res = await llm_scheduler.invoke(llm, prompt, INTERACTIVE)
         return res.content.strip().replace("'", "").replace('"', "")
-    except:
+    except Exception: # Not bare: must not swallow request cancellation
         return "General"
 
 # 1. UPDATED SIGNUP (Accepts Security Q&A)
@@ -210,7 +250,8 @@ async def upload_material(
 
     # Run PyPDFLoader (It reads from the file we just wrote)
     loader = PyPDFLoader(file_path)
-    pages = loader.load_and_split()
+    with stage_timer("pdf_parse"):
+        pages = loader.load_and_split()
     
     for p in pages:
         p.metadata["unit"] = unit_name
@@ -269,6 +310,21 @@ def nuke_everything(db: Session = Depends(get_db)):
     except Exception as e:
         return {"error": f"Reset failed: {str(e)}"}
 
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/embedding-stats")
+def get_embedding_stats():
+    # Batch sizes, queue wait and cache hit rate of the query embedding service
+    return BatchedEmbeddings.summarize_stats(collect_stats("embedding"))
+
+@app.get("/admin/llm-stats")
+def get_llm_stats():
+    # Queue depth, coalesced prompts and 429 retries of the Groq scheduler
+    return LLMScheduler.summarize_stats(collect_stats("llm"))
+
 @app.get("/faculty/units")
 async def get_units(db: Session = Depends(get_db)):
     results = db.query(models.DoubtRecord.unit).distinct().all()
@@ -291,12 +347,12 @@ async def ask_ai(
     full_transcript = "\n".join([f"{'Student' if m['role']=='user' else 'AI'}: {m['text']}" for m in limited_history])
     
     # 1. RAG Search
-    vector_db = PineconeVectorStore(index_name=index_name, embedding=embeddings)
-    docs = vector_db.similarity_search(question, k=8, filter={"unit": unit})
+    # Run off the event loop so concurrent questions can share an embedding batch
+    docs = await run_in_threadpool(search_unit, question, unit, 8)
     context_text = "\n".join([d.page_content for d in docs])[:4000]
 
     # 2. Analytics
-    topic = categorize_doubt(question, context_text)
+    topic = await categorize_doubt(question, context_text)
     db.add(models.DoubtRecord(question=question, topic=topic, unit=unit))
     db.commit()
 
@@ -304,7 +360,7 @@ async def ask_ai(
     relevant_sim = find_simulation(question)
     
     # 4. Generate AI Answer (HUMAN TUTOR PROMPT)
-    llm = ChatGroq(temperature=0.6, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"))
+    llm = ChatGroq(temperature=0.6, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
     
     sim_instruction = ""
     if relevant_sim:
@@ -355,7 +411,7 @@ async def ask_ai(
     
     """
     
-    response = llm.invoke(prompt)
+    response = await llm_scheduler.invoke(llm, prompt, INTERACTIVE)
     
     return {
         "answer": response.content,
@@ -377,12 +433,11 @@ async def get_topics(unit_name: str, db: Session = Depends(get_db)):
 @app.post("/student/quiz/generate")
 async def generate_quiz(unit: str = Form(...)):
     # 1. Fetch Context
-    vector_db = PineconeVectorStore(index_name=index_name, embedding=embeddings)
-    docs = vector_db.similarity_search(f"important concepts in {unit}", k=5, filter={"unit": unit})
+    docs = await run_in_threadpool(search_unit, f"important concepts in {unit}", unit, 5)
     context_text = "\n".join([d.page_content for d in docs])[:3000]
 
     # 2. Prompt LLM for JSON Output
-    llm = ChatGroq(temperature=0.3, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"))
+    llm = ChatGroq(temperature=0.3, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
     
     prompt = f"""
     Context: {context_text}
@@ -400,7 +455,7 @@ async def generate_quiz(unit: str = Form(...)):
     """
     
     try:
-        res = llm.invoke(prompt)
+        res = await llm_scheduler.invoke(llm, prompt, QUIZ)
         # Clean response to ensure valid JSON (sometimes LLMs add ```json ... ```)
         json_str = res.content.replace("```json", "").replace("```", "").strip()
         quiz_data = json.loads(json_str)
@@ -451,7 +506,8 @@ def find_column(columns, keywords):
 async def upload_cat1(file: UploadFile = File(...), db: Session = Depends(get_db)):
     print(f"📂 STARTING CAT 1 UPLOAD: {file.filename}")
     try:
-        df = pd.read_excel(file.file)
+        with stage_timer("excel_parse"):
+            df = pd.read_excel(file.file)
         print(f"📊 Columns Found: {df.columns.tolist()}")
 
         # 1. Identify Key Columns using Fuzzy Search
@@ -507,7 +563,8 @@ async def upload_cat1(file: UploadFile = File(...), db: Session = Depends(get_db
 async def upload_cat2(file: UploadFile = File(...), db: Session = Depends(get_db)):
     print(f"📂 STARTING CAT 2 UPLOAD: {file.filename}")
     try:
-        df = pd.read_excel(file.file)
+        with stage_timer("excel_parse"):
+            df = pd.read_excel(file.file)
         print(f"📊 Columns Found: {df.columns.tolist()}")
 
         reg_col = find_column(df.columns, ["REG", "REGISTER NUMBER"])
@@ -607,7 +664,7 @@ async def get_deep_analytics(db: Session = Depends(get_db)):
     if friction_units and friction_units[0]['friction_score'] > 40:
         print("🤖 CONTACTING AI FOR INSIGHTS...")
         try:
-            llm = ChatGroq(temperature=0.3, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"))
+            llm = ChatGroq(temperature=0.3, model_name="llama-3.1-8b-instant", groq_api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
             
             prompt = f"""
             You are a senior academic analyst.
@@ -631,7 +688,7 @@ async def get_deep_analytics(db: Session = Depends(get_db)):
             CRITICAL: RETURN ONLY THE JSON ARRAY. NO MARKDOWN. NO INTRO TEXT.
             """
             
-            res = llm.invoke(prompt)
+            res = await llm_scheduler.invoke(llm, prompt, ANALYTICS)
             print(f"📥 RAW AI RESPONSE: {res.content}") # DEBUG PRINT
             
             # Clean the response (Remove ```json ... ``` wrappers)
@@ -653,4 +710,34 @@ async def get_deep_analytics(db: Session = Depends(get_db)):
         "graph_data": analysis_data,
         "ai_insights": ai_insights,
         "poor_performers": [s for s in students if s.total_percentage < 50]
-    }
\ No newline at end of file
+    }
+
+# --- BULK EXPORT (Accreditation Reports) ---
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "parquet": (stream_parquet, "application/vnd.apache.parquet"),
+}
+
+@app.get("/faculty/export/{table}")
+def export_table(
+    table: str,
+    format: str = "csv",
+    unit: Optional[str] = None,
+    start: Optional[date] = None, # Inclusive
+    end: Optional[date] = None,   # Inclusive
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'parquet'")
+    try:
+        names, query = build_export_query(table, unit, start, end)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Rows are read through a server-side cursor and sent batch by batch,
+    # so memory and time-to-first-byte don't grow with the table
+    stream, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream(names, query),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    )
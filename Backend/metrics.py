@@ -0,0 +1,348 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Latency buckets in seconds (covers bcrypt/DB at the low end, LLM calls at the high end)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REGISTRY = []
+
+# Multi-worker mode (see gunicorn_conf.py): each worker publishes snapshots of its
+# registry here and /metrics merges all of them, so a scrape covers every worker.
+METRICS_DIR = os.getenv("EDUAI_METRICS_DIR")
+SNAPSHOT_INTERVAL = 5  # seconds between background snapshots
+
+# name -> function returning raw (summable) counters, e.g. for /admin/llm-stats
+STATS_SOURCES = {}
+# Raw stats that describe the current moment; only counted for live workers
+GAUGE_STATS = {"queue_depth", "in_flight", "cache_entries"}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    @staticmethod
+    def merge(values, other):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def render(self, values=None):
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    @staticmethod
+    def merge(values, other):
+        for key, (counts, total, count) in other.items():
+            series = values.setdefault(key, [[0] * len(counts), 0.0, 0])
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self, values=None):
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# --- MULTI-WORKER AGGREGATION ---
+def register_stats(name, raw_stats):
+    STATS_SOURCES[name] = raw_stats
+
+
+def reset_metrics():
+    """Drop samples inherited from the master (called in each freshly forked worker)."""
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def write_snapshot():
+    snapshot = {
+        "pid": os.getpid(),
+        # JSON has no tuple keys, so label values are stored as lists
+        "metrics": {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY},
+        "stats": {name: raw_stats() for name, raw_stats in STATS_SOURCES.items()},
+    }
+    path = os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json")
+    tmp_path = f"{path}.{threading.get_ident()}.tmp" # The writer thread and a scrape may overlap
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path) # Readers never see a half-written file
+
+
+def start_snapshot_writer():
+    def run():
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL)
+            write_snapshot()
+
+    threading.Thread(target=run, name="metrics-snapshot", daemon=True).start()
+
+
+def _read_snapshots():
+    # Our own snapshot is refreshed first so this worker's numbers are always current.
+    # Files of exited workers are kept: their counters are part of the totals.
+    write_snapshot()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "worker-*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def render_metrics():
+    if not METRICS_DIR:
+        values_by_metric = {metric.name: None for metric in REGISTRY}
+    else:
+        values_by_metric = {metric.name: {} for metric in REGISTRY}
+        for snapshot in _read_snapshots():
+            for metric in REGISTRY:
+                entries = snapshot["metrics"].get(metric.name, [])
+                metric.merge(values_by_metric[metric.name], {tuple(key): value for key, value in entries})
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(values_by_metric[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+def collect_stats(name):
+    """Raw stats of one source summed over all workers (max_* fields take the maximum)."""
+    if not METRICS_DIR:
+        return STATS_SOURCES[name]()
+
+    merged = {}
+    for snapshot in _read_snapshots():
+        raw = snapshot["stats"].get(name)
+        if raw is None:
+            continue
+        alive = _is_alive(snapshot["pid"])
+        for key, value in raw.items():
+            if key in GAUGE_STATS and not alive:
+                continue
+            if key.startswith("max_"):
+                merged[key] = max(merged.get(key, 0), value)
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+# --- METRIC DEFINITIONS ---
+REQUEST_LATENCY = Histogram(
+    "eduai_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+STAGE_LATENCY = Histogram(
+    "eduai_stage_duration_seconds", "Latency of internal stages (vector search, embedding, PDF parse, bcrypt...).", ("stage",)
+)
+LLM_LATENCY = Histogram(
+    "eduai_llm_call_duration_seconds", "Latency of individual LLM calls.", ("model", "priority", "outcome")
+)
+LLM_TOKENS = Counter(
+    "eduai_llm_tokens_total", "LLM tokens used, split into prompt and completion.", ("model", "kind")
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "eduai_embedding_batch_size", "Distinct queries per batched embedding forward pass.", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "eduai_embedding_queue_wait_seconds", "Time a query waited for its embedding batch to start."
+)
+DB_QUERY_LATENCY = Histogram(
+    "eduai_db_query_duration_seconds", "SQL statement execution time.", ("statement",)
+)
+DB_POOL_WAIT = Histogram(
+    "eduai_db_pool_checkout_wait_seconds", "Time spent waiting for a free connection in the SQLAlchemy pool (excludes connecting)."
+)
+DB_CONNECT_LATENCY = Histogram(
+    "eduai_db_connect_duration_seconds", "Time to open a new database connection for the pool."
+)
+
+
+# --- STAGE TIMING HELPERS ---
+def stage_timer(stage):
+    return STAGE_LATENCY.time(stage=stage)
+
+
+def timed(stage):
+    """Decorator that records each call of a sync function as a stage."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- HTTP MIDDLEWARE ---
+class MetricsMiddleware:
+    """Plain ASGI middleware (no request/response wrapping) that times every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Use the route template (/units/pdf/{unit_name}) so labels stay bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method=scope["method"], route=route, status=status)
+
+
+# --- SQLALCHEMY INSTRUMENTATION ---
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a free connection.
+    Opening a new connection (overflow or a replaced one) is timed separately and
+    left out of the wait, so slow connects don't look like pool exhaustion.
+    """
+
+    _connect_time = threading.local()
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_CONNECT_LATENCY.observe(elapsed)
+            self._connect_time.seconds = getattr(self._connect_time, "seconds", 0.0) + elapsed
+
+    def _do_get(self):
+        self._connect_time.seconds = 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(max(0.0, time.perf_counter() - start - self._connect_time.seconds))
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.observe(time.perf_counter() - start, statement=verb)
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
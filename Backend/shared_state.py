@@ -0,0 +1,111 @@
+import ctypes
+import hashlib
+import multiprocessing
+import time
+
+from llm_scheduler import TokenBucket
+
+# Objects in this module keep their state in anonymous shared memory. They must be
+# created in the master process before workers are forked (gunicorn preload_app),
+# so that every worker inherits the same mapping.
+
+
+def _shared_field(index):
+    return property(
+        lambda self: self._state[index],
+        lambda self, value: self._state.__setitem__(index, value)
+    )
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose counters live in shared memory, so all workers draw from one
+    Groq quota. A worker's head-of-queue call that has to wait for budget announces
+    its priority class and token estimate, and withdraws the announcement once it
+    gets budget. Lower classes elsewhere only yield when the remaining budget can't
+    cover both the announced calls and their own. Announcements also expire on
+    their own, so a crashed worker can't block the others.
+    """
+
+    PRIORITY_CLASSES = 8
+    poll_interval = 0.1
+    announce_ttl = 0.3
+
+    requests = _shared_field(0)
+    tokens = _shared_field(1)
+    updated = _shared_field(2)
+    blocked_until = _shared_field(3)
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self._state = multiprocessing.RawArray(ctypes.c_double, 4)
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self._lock = multiprocessing.Lock()
+        # Last time (monotonic, system-wide on Linux) a blocked waiter of each class
+        # was seen, and the tokens it needs
+        self._announced = multiprocessing.RawArray(ctypes.c_double, self.PRIORITY_CLASSES)
+        self._announced_tokens = multiprocessing.RawArray(ctypes.c_double, self.PRIORITY_CLASSES)
+        self._own_announcements = {}  # class -> timestamp this process last wrote
+
+    def announce(self, priority, tokens):
+        slot = min(priority, self.PRIORITY_CLASSES - 1)
+        now = time.monotonic()
+        with self._lock:
+            self._announced[slot] = now
+            self._announced_tokens[slot] = min(tokens, self.tokens_per_minute)
+        self._own_announcements[slot] = now
+
+    def withdraw(self, priority):
+        slot = min(priority, self.PRIORITY_CLASSES - 1)
+        with self._lock:
+            # Leave it if another worker has announced the same class since
+            if self._announced[slot] == self._own_announcements.pop(slot, None):
+                self._announced[slot] = 0.0
+
+    def outranked(self, priority, tokens):
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            waiting = [p for p in range(min(priority, self.PRIORITY_CLASSES)) if now - self._announced[p] < self.announce_ttl]
+            if not waiting:
+                return False
+            self._refill(now)
+            needed_tokens = tokens + sum(self._announced_tokens[p] for p in waiting)
+            return self.requests < 1 + len(waiting) or self.tokens < needed_tokens
+
+
+class SharedVectorCache:
+    """
+    Fixed-size, direct-mapped cache of query vectors in shared memory. A query
+    embedded by one worker is a cache hit for all the others. Colliding entries
+    simply overwrite each other.
+    """
+
+    KEY_SIZE = 16
+
+    def __init__(self, slots=4096, dim=384):
+        self.slots = slots
+        self.dim = dim
+        self._keys = multiprocessing.RawArray(ctypes.c_char, slots * self.KEY_SIZE)
+        self._vectors = multiprocessing.RawArray(ctypes.c_float, slots * dim)
+        self._lock = multiprocessing.Lock()
+
+    def _locate(self, text):
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=self.KEY_SIZE).digest()
+        return int.from_bytes(digest[:8], "little") % self.slots, digest
+
+    def get(self, text):
+        slot, digest = self._locate(text)
+        key_start = slot * self.KEY_SIZE
+        with self._lock:
+            if self._keys[key_start:key_start + self.KEY_SIZE] != digest:
+                return None
+            return self._vectors[slot * self.dim:(slot + 1) * self.dim]
+
+    def put(self, text, vector):
+        if len(vector) != self.dim:
+            return
+        slot, digest = self._locate(text)
+        key_start = slot * self.KEY_SIZE
+        with self._lock:
+            self._vectors[slot * self.dim:(slot + 1) * self.dim] = vector
+            self._keys[key_start:key_start + self.KEY_SIZE] = digest
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_scheduler import ANALYTICS, INTERACTIVE, LLMScheduler  # noqa: E402
+from shared_state import SharedTokenBucket  # noqa: E402
+
+
+class FakeLLM:
+    model_name = "fake"
+    temperature = 0
+    max_tokens = 16
+
+    def invoke(self, prompt):
+        return prompt
+
+
+def test_low_priority_call_is_not_starved_when_budget_is_ample():
+    scheduler = LLMScheduler(bucket=SharedTokenBucket(100000, 10 ** 8))
+    llm = FakeLLM()
+
+    async def interactive_traffic(stop):
+        n = 0
+        while not stop.is_set():
+            await scheduler.invoke(llm, f"question {n}", INTERACTIVE)
+            n += 1
+            await asyncio.sleep(0.25)
+
+    async def main():
+        stop = asyncio.Event()
+        traffic = asyncio.create_task(interactive_traffic(stop))
+        await asyncio.sleep(0.05)
+        start = time.monotonic()
+        await asyncio.wait_for(scheduler.invoke(llm, "insights", ANALYTICS), 2)
+        elapsed = time.monotonic() - start
+        stop.set()
+        await traffic
+        return elapsed
+
+    assert asyncio.run(main()) < 0.5
+
+
+class SlowLLM(FakeLLM):
+    def invoke(self, prompt):
+        time.sleep(0.2)
+        return prompt
+
+
+def test_cancelling_the_first_caller_does_not_cancel_coalesced_callers():
+    scheduler = LLMScheduler()
+    llm = SlowLLM()
+
+    async def main():
+        owner = asyncio.create_task(scheduler.invoke(llm, "same prompt"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(scheduler.invoke(llm, "same prompt"))
+        await asyncio.sleep(0.05)
+        owner.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "same prompt"
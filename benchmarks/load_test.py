@@ -0,0 +1,320 @@
+"""
+Offline load test for the EduAI backend.
+
+Drives a weighted mix of student, faculty and analytics requests against the
+FastAPI app at several concurrency levels and reports throughput and
+p50/p95/p99 latency per endpoint. By default the app runs in-process with the
+stand-ins from standins.py (fake Groq, in-memory vector store, SQLite); pass
+--url to target a server started with `python benchmarks/standins.py`
+(add --workers N there to benchmark the multi-worker gunicorn deployment).
+
+Results are written as JSON so runs can be compared across commits:
+
+    python benchmarks/load_test.py --concurrency 1,8,32 --duration 20
+    python benchmarks/load_test.py --compare benchmarks/results/<old>.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import standins
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+
+UNITS = ["Unit 1", "Unit 2", "Unit 3", "Unit 4", "Unit 5"]
+QUESTIONS = [
+    "What is the period of a simple pendulum?",
+    "Why does current split in a parallel circuit?",
+    "How do I find the range of a projectile?",
+    "What causes wave interference?",
+    "Explain friction with an example.",
+    "What is specific heat capacity?",
+    "How does a prism bend light?",
+    "Derive the equation of motion v = u + at.",
+]
+
+
+# --- TEST DATA ---
+def make_pdf(lines):
+    """Minimal single-page PDF with one line of text per entry."""
+    text_ops = "BT /F1 12 Tf 72 720 Td 14 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for line in lines
+    ) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(text_ops)} >>\nstream\n{text_ops}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+def make_cat_sheet(columns, students=60, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(students):
+        row = {"Register Number": f"REG{i:04d}", "Student Name": f"Student {i}"}
+        for col, max_marks in columns.items():
+            row[col] = rng.randint(0, max_marks)
+        rows.append(row)
+    out = io.BytesIO()
+    pd.DataFrame(rows).to_excel(out, index=False)
+    return out.getvalue()
+
+
+class Payloads:
+    def __init__(self):
+        self.pdfs = {
+            unit: make_pdf([f"{unit} notes."] + [f"{q} Explanation for {unit}." for q in QUESTIONS])
+            for unit in UNITS
+        }
+        self.cat1 = make_cat_sheet({"CO1": 30, "CO2": 30, "CO3": 15}, seed=1)
+        self.cat2 = make_cat_sheet({"CO3": 15, "CO4": 30, "CO5": 30}, seed=2)
+
+
+# --- REQUEST MIX ---
+async def ask(client, rng, payloads):
+    history = json.dumps([{"role": "user", "text": rng.choice(QUESTIONS)}, {"role": "ai", "text": "Sure!"}])
+    data = {"question": rng.choice(QUESTIONS), "unit": rng.choice(UNITS), "history": history}
+    return await client.post("/student/ask", data=data)
+
+
+async def quiz(client, rng, payloads):
+    return await client.post("/student/quiz/generate", data={"unit": rng.choice(UNITS)})
+
+
+async def upload_material(client, rng, payloads):
+    unit = rng.choice(UNITS)
+    files = {"file": (f"{unit}.pdf", payloads.pdfs[unit], "application/pdf")}
+    return await client.post("/faculty/upload", data={"unit": unit}, files=files)
+
+
+async def upload_cat1(client, rng, payloads):
+    return await client.post("/faculty/upload-cat1", files={"file": ("cat1.xlsx", payloads.cat1)})
+
+
+async def upload_cat2(client, rng, payloads):
+    return await client.post("/faculty/upload-cat2", files={"file": ("cat2.xlsx", payloads.cat2)})
+
+
+async def chart(client, rng, payloads):
+    return await client.get("/faculty/analytics/chart")
+
+
+async def topics(client, rng, payloads):
+    return await client.get(f"/faculty/analytics/topics/{rng.choice(UNITS)}")
+
+
+async def deep_analytics(client, rng, payloads):
+    return await client.get("/faculty/marks/deep-analytics")
+
+
+# Endpoint label -> (request function, weight)
+MIX = {
+    "POST /student/ask": (ask, 50),
+    "POST /student/quiz/generate": (quiz, 15),
+    "POST /faculty/upload": (upload_material, 3),
+    "POST /faculty/upload-cat1": (upload_cat1, 2),
+    "POST /faculty/upload-cat2": (upload_cat2, 2),
+    "GET /faculty/analytics/chart": (chart, 12),
+    "GET /faculty/analytics/topics/{unit_name}": (topics, 8),
+    "GET /faculty/marks/deep-analytics": (deep_analytics, 8),
+}
+
+
+# --- DRIVER ---
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    by_endpoint = {}
+    for endpoint, latency, ok in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, ok))
+
+    endpoints = {}
+    for endpoint, entries in sorted(by_endpoint.items()):
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        endpoints[endpoint] = {
+            "requests": len(entries),
+            "errors": sum(1 for _, ok in entries if not ok),
+            "throughput_rps": round(len(entries) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+    return {
+        "duration_s": round(elapsed, 2),
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "endpoints": endpoints,
+    }
+
+
+async def run_level(client, payloads, concurrency, duration, seed):
+    names = list(MIX)
+    weights = [MIX[name][1] for name in names]
+    samples = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await MIX[endpoint][0](client, rng, payloads)
+                # Several endpoints report failures as {"error": ...} with a 200
+                ok = response.status_code < 400 and '"error"' not in response.text[:200]
+            except httpx.HTTPError:
+                ok = False
+            samples.append((endpoint, time.perf_counter() - start, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def seed_data(client, payloads):
+    """Give every unit some knowledge-base content and the class some marks before measuring."""
+    rng = random.Random(0)
+    for unit in UNITS:
+        files = {"file": (f"{unit}.pdf", payloads.pdfs[unit], "application/pdf")}
+        response = await client.post("/faculty/upload", data={"unit": unit}, files=files)
+        response.raise_for_status()
+    await upload_cat1(client, rng, payloads)
+    await upload_cat2(client, rng, payloads)
+
+
+async def run(args):
+    payloads = Payloads()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+    else:
+        standins.install(args.workdir, **standins.config_from_args(args))
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout, limits=limits)
+
+    results = {}
+    async with client:
+        await seed_data(client, payloads)
+        if args.warmup:
+            await run_level(client, payloads, max(args.concurrency), args.warmup, seed=0)
+        for level in args.concurrency:
+            print(f"Running concurrency={level} for {args.duration}s...", file=sys.stderr)
+            results[str(level)] = await run_level(client, payloads, level, args.duration, seed=level)
+    return results
+
+
+# --- REPORTING ---
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report):
+    for level, result in report["results"].items():
+        print(f"\n== concurrency {level}: {result['throughput_rps']} req/s, "
+              f"{result['requests']} requests, {result['errors']} errors ==")
+        print(f"{'endpoint':<45}{'req':>7}{'err':>5}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for endpoint, stats in result["endpoints"].items():
+            print(f"{endpoint:<45}{stats['requests']:>7}{stats['errors']:>5}{stats['throughput_rps']:>9}"
+                  f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def print_comparison(report, baseline):
+    print(f"\n== {report['commit']} vs {baseline['commit']} (p95 ms / req/s, negative p95 delta is better) ==")
+    for level, result in report["results"].items():
+        old = baseline["results"].get(level)
+        if not old:
+            continue
+        print(f"concurrency {level}: throughput {old['throughput_rps']} -> {result['throughput_rps']} req/s")
+        for endpoint, stats in result["endpoints"].items():
+            old_stats = old["endpoints"].get(endpoint)
+            if not old_stats:
+                continue
+            delta = stats["p95_ms"] - old_stats["p95_ms"]
+            change = f"{delta / old_stats['p95_ms'] * 100:+.1f}%" if old_stats["p95_ms"] else "n/a"
+            print(f"  {endpoint:<45}p95 {old_stats['p95_ms']:>9} -> {stats['p95_ms']:>9} ({change})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the EduAI backend")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3, help="Warm-up seconds before measuring (0 to skip)")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    standins.add_config_arguments(parser)
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+    # install() changes directory into the stand-in workdir, so pin relative paths first
+    args.output = args.output and os.path.abspath(args.output)
+    args.compare = args.compare and os.path.abspath(args.compare)
+
+    started_at = datetime.now(timezone.utc)
+    results = asyncio.run(run(args))
+    report = {
+        "commit": git_commit(),
+        "timestamp": started_at.isoformat(),
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "target": args.url or "in-process",
+            "mix": {endpoint: weight for endpoint, (_, weight) in MIX.items()},
+            "standins": dict(standins.CONFIG) if not args.url else None,
+        },
+        "results": results,
+    }
+
+    print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}-{started_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Local stand-ins for the external services used by the backend, so the FastAPI
+app can be load-tested offline:
+
+- FakeChatGroq: streams a canned answer with configurable latency (and can
+  inject 429s to exercise the LLM scheduler).
+- InMemoryVectorStore / FakePinecone: Pinecone replaced by brute-force cosine
+  search over an in-process list (SqliteVectorStore keeps the vectors in a
+  SQLite file instead, so several worker processes see the same index).
+- FakeEmbeddings: deterministic hashed bag-of-words vectors with a configurable
+  per-batch delay standing in for the MiniLM forward pass.
+
+`install()` registers these under the real module names before the app is
+imported, and points the database at SQLite. Run this module directly to serve
+the stubbed app over HTTP, either as one uvicorn process or, with --workers, as
+the gunicorn deployment from Backend/gunicorn_conf.py (app loaded once in the
+master via standins_app.py, workers forked from it):
+
+    python benchmarks/standins.py --port 7860
+    python benchmarks/standins.py --port 7860 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Backend")
+
+# Tunables, set through install()
+CONFIG = {
+    "llm_latency_ms": 300,      # Time to first token
+    "llm_tokens_per_second": 400,
+    "llm_429_rate": 0.0,        # Fraction of LLM calls answered with a rate-limit error
+    "embed_latency_ms": 15,     # Per forward pass, regardless of batch size
+    "embedding_dim": 384,
+}
+
+
+# --- LLM ---
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeMessage:
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+def _canned_answer(prompt):
+    if "Multiple Choice Questions" in prompt:
+        return json.dumps([
+            {"question": f"Sample question {i}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+            for i in range(1, 6)
+        ])
+    if "senior academic analyst" in prompt:
+        return json.dumps([{
+            "unit": "Unit 1",
+            "observation": "Low marks with many doubts.",
+            "root_cause": "Numerical complexity.",
+            "recommendation": "Worked examples in class."
+        }])
+    if "Return ONLY a 1-2 word topic name" in prompt:
+        return "Kinematics"
+    return ("That's a great question! As mentioned in your unit notes, the key idea is Newton's second law.\n"
+            "$$ F = ma $$\n"
+            "where **F** is force, **m** is mass and **a** is acceleration. " * 4)
+
+
+class FakeChatGroq:
+    _calls = 0
+    _lock = threading.Lock()
+
+    def __init__(self, model_name="llama-3.1-8b-instant", temperature=0.7, groq_api_key=None, max_tokens=None, **kwargs):
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def stream(self, prompt):
+        with FakeChatGroq._lock:
+            FakeChatGroq._calls += 1
+            call_number = FakeChatGroq._calls
+
+        time.sleep(CONFIG["llm_latency_ms"] / 1000)
+        rate = CONFIG["llm_429_rate"]
+        if rate and int(call_number * rate) != int((call_number - 1) * rate):
+            raise FakeRateLimitError("429 Too Many Requests (stand-in)")
+
+        # ~4 characters per token, emitted in small chunks
+        answer = _canned_answer(prompt)
+        chunk_chars = 16
+        delay = chunk_chars / 4 / CONFIG["llm_tokens_per_second"]
+        for i in range(0, len(answer), chunk_chars):
+            time.sleep(delay)
+            yield FakeMessage(answer[i:i + chunk_chars])
+
+    def invoke(self, prompt):
+        content = "".join(chunk.content for chunk in self.stream(prompt))
+        input_tokens = len(prompt) // 4
+        output_tokens = len(content) // 4
+        return FakeMessage(content, {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+
+# --- EMBEDDINGS ---
+class FakeEmbeddings:
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def _vector(self, text):
+        vector = [0.0] * CONFIG["embedding_dim"]
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % len(vector)] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        # One "forward pass" per call, like a batched model
+        time.sleep(CONFIG["embed_latency_ms"] / 1000)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# --- VECTOR STORE ---
+class InMemoryVectorStore:
+    _indexes = {}  # index_name -> list of (vector, document)
+    _lock = threading.Lock()
+
+    def __init__(self, index_name, embedding, **kwargs):
+        self.index_name = index_name
+        self.embedding = embedding
+
+    @classmethod
+    def from_documents(cls, documents, embedding, index_name, **kwargs):
+        vectors = embedding.embed_documents([d.page_content for d in documents])
+        cls._add(index_name, list(zip(vectors, documents)))
+        return cls(index_name=index_name, embedding=embedding)
+
+    @classmethod
+    def _add(cls, index_name, entries):
+        with cls._lock:
+            cls._indexes.setdefault(index_name, []).extend(entries)
+
+    @classmethod
+    def _entries(cls, index_name):
+        with cls._lock:
+            return list(cls._indexes.get(index_name, []))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._indexes.clear()
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        query_vector = self.embedding.embed_query(query)
+        entries = self._entries(self.index_name)
+        if filter:
+            entries = [(v, d) for v, d in entries if all(d.metadata.get(key) == value for key, value in filter.items())]
+        scored = sorted(entries, key=lambda e: -sum(a * b for a, b in zip(query_vector, e[0])))
+        return [d for _, d in scored[:k]]
+
+
+class SqliteVectorStore(InMemoryVectorStore):
+    """Same search, but the index lives in a SQLite file shared by every worker process."""
+
+    path = None  # Set by install()
+
+    @classmethod
+    def _connect(cls):
+        conn = sqlite3.connect(cls.path, timeout=30)
+        conn.execute("CREATE TABLE IF NOT EXISTS vectors (index_name TEXT, vector TEXT, content TEXT, metadata TEXT)")
+        return conn
+
+    @classmethod
+    def _add(cls, index_name, entries):
+        rows = [(index_name, json.dumps(v), d.page_content, json.dumps(d.metadata)) for v, d in entries]
+        with cls._connect() as conn:
+            conn.executemany("INSERT INTO vectors VALUES (?, ?, ?, ?)", rows)
+
+    @classmethod
+    def _entries(cls, index_name):
+        from langchain_core.documents import Document
+        with cls._connect() as conn:
+            rows = conn.execute("SELECT vector, content, metadata FROM vectors WHERE index_name = ?", (index_name,)).fetchall()
+        return [(json.loads(v), Document(page_content=c, metadata=json.loads(m))) for v, c, m in rows]
+
+    @classmethod
+    def clear(cls):
+        with cls._connect() as conn:
+            conn.execute("DELETE FROM vectors")
+
+
+class FakeIndex:
+    def __init__(self, name):
+        self.name = name
+
+    def delete(self, delete_all=False, **kwargs):
+        if delete_all:
+            sys.modules["langchain_pinecone"].PineconeVectorStore.clear()
+
+
+class FakePinecone:
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def Index(self, name):
+        return FakeIndex(name)
+
+
+# --- INSTALLATION ---
+def install(workdir=None, shared_vector_store=False, **config):
+    """
+    Register the stand-ins under the real module names and point the app at a
+    fresh SQLite database inside `workdir`. Must run before `main` is imported.
+    With `shared_vector_store`, uploaded notes go to a SQLite file in `workdir`
+    instead of process memory (needed when several workers serve the app).
+    Returns the working directory (uploads/ is created there).
+    """
+    CONFIG.update({key: value for key, value in config.items() if value is not None})
+
+    workdir = workdir or tempfile.mkdtemp(prefix="eduai-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    vector_store = InMemoryVectorStore
+    if shared_vector_store:
+        SqliteVectorStore.path = os.path.join(workdir, "vectors.db")
+        vector_store = SqliteVectorStore
+
+    shims = {
+        "langchain_groq": {"ChatGroq": FakeChatGroq},
+        "langchain_huggingface": {"HuggingFaceEmbeddings": FakeEmbeddings},
+        "langchain_pinecone": {"PineconeVectorStore": vector_store},
+        "pinecone": {"Pinecone": FakePinecone},
+    }
+    for module_name, attributes in shims.items():
+        module = types.ModuleType(module_name)
+        module.__dict__.update(attributes)
+        sys.modules[module_name] = module
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # No real quota behind the stand-in, so don't let the scheduler throttle by default
+    os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "100000")
+    os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "100000000")
+    os.environ.setdefault("PINECONE_INDEX_NAME", "eduai")
+    os.chdir(workdir)
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    return workdir
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--llm-latency-ms", type=float, help="Fake LLM time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, help="Fake LLM streaming speed")
+    parser.add_argument("--llm-429-rate", type=float, help="Fraction of LLM calls that fail with a 429")
+    parser.add_argument("--embed-latency-ms", type=float, help="Fake embedding forward pass time")
+    parser.add_argument("--workdir", help="Directory for the SQLite database and uploads")
+
+
+def config_from_args(args):
+    return {
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_tokens_per_second": args.llm_tokens_per_second,
+        "llm_429_rate": args.llm_429_rate,
+        "embed_latency_ms": args.embed_latency_ms,
+    }
+
+
+def run_gunicorn(args):
+    # standins_app.py repeats install() inside gunicorn's master; pass it everything through the environment
+    env = dict(os.environ)
+    env.update({
+        "EDUAI_STANDINS_WORKDIR": os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="eduai-bench-")),
+        "EDUAI_STANDINS_CONFIG": json.dumps(config_from_args(args)),
+        "WEB_CONCURRENCY": str(args.workers),
+        "PORT": str(args.port),
+    })
+    benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [
+        sys.executable, "-m", "gunicorn", "standins_app:app",
+        "--config", os.path.join(BACKEND_DIR, "gunicorn_conf.py"),
+        "--pythonpath", benchmarks_dir,
+        "--bind", f"{args.host}:{args.port}",
+    ]
+    os.execvpe(sys.executable, command, env)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the backend with local Groq/Pinecone stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--workers", type=int, help="Serve with gunicorn and this many workers (Backend/gunicorn_conf.py)")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.workers:
+        run_gunicorn(args)
+
+    install(args.workdir, **config_from_args(args))
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port)
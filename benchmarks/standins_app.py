@@ -0,0 +1,18 @@
+"""
+gunicorn entry point for the stand-in backend (`python benchmarks/standins.py
+--workers N` starts it). With preload_app the master imports this module once,
+so the stand-ins are installed before `main` is loaded and every worker forked
+from it serves the same stubbed app, database and vector store.
+"""
+import json
+import os
+
+import standins
+
+standins.install(
+    os.environ["EDUAI_STANDINS_WORKDIR"],
+    shared_vector_store=True,
+    **json.loads(os.getenv("EDUAI_STANDINS_CONFIG", "{}"))
+)
+
+from main import app  # noqa: E402